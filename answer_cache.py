@@ -0,0 +1,144 @@
+"""Opt-in cache of consultation answers to first questions.
+
+Cached answers are generated from a prompt that contains only the Sun, Moon and
+Rising signs, the search context and the question, never the user's profile, so
+they are safe to serve to other users. They are keyed on the normalized question,
+those placements and the prompt version, and stored in SQLite so they survive
+restarts and are shared by all worker processes. Entries expire after a TTL, the
+least recently used ones are evicted beyond a size limit, and entries written for
+another prompt version are dropped when the cache is opened. The cache is optional, so SQLite errors are
+logged and treated as misses rather than failing the request.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+def normalize_question(question):
+    """Lowercase the question and drop punctuation and extra whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+
+def key_placements(chart_data):
+    """The Sun, Moon and Rising signs of a chart, the only placements a cacheable answer is built from"""
+    planets = chart_data.get('planets', {})
+    return {
+        "Sun": planets.get('Sun', {}).get('sign'),
+        "Moon": planets.get('Moon', {}).get('sign'),
+        "Rising": chart_data.get('ascendant', {}).get('sign')
+    }
+
+
+def placement_signature(chart_data):
+    """Describe the placements a cacheable answer depends on"""
+    return ";".join(f"{name}:{sign}" for name, sign in key_placements(chart_data).items())
+
+
+def prompt_version(*parts):
+    """Short hash of everything that shapes an answer (prompt templates, model settings),
+    so cached answers are invalidated when any of it changes"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def answer_cache_key(question, chart_data, version):
+    """Cache key for a first question about a chart"""
+    key = json.dumps([normalize_question(question), placement_signature(chart_data), version])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class AnswerCache:
+    """SQLite-backed answer cache with a TTL and least-recently-used eviction"""
+
+    def __init__(self, path, version, ttl_seconds=7 * 24 * 3600, max_entries=10000):
+        self.path = path
+        self.version = version
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    key TEXT PRIMARY KEY,
+                    version TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+            # Answers generated with a different prompt or model are stale
+            self._conn.execute("DELETE FROM answers WHERE version != ?", (version,))
+
+    def get(self, key):
+        """Return the cached answer for key, or None if there is no fresh entry (or the lookup failed)"""
+        now = time.time()
+        with self._lock:
+            try:
+                with self._conn:
+                    row = self._conn.execute(
+                        "SELECT answer, created_at FROM answers WHERE key = ? AND version = ?", (key, self.version)
+                    ).fetchone()
+                    if row is None or now - row[1] > self.ttl_seconds:
+                        if row is not None:
+                            self._conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                        self.misses += 1
+                        return None
+                    self._conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+            except sqlite3.Error as e:
+                print(f"Answer cache lookup failed: {e}")
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, answer):
+        """Store an answer, then drop expired entries and evict the least recently used beyond max_entries"""
+        now = time.time()
+        with self._lock:
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO answers (key, version, answer, created_at, last_used) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key, self.version, answer, now, now)
+                    )
+                    self._conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,))
+                    self._conn.execute(
+                        "DELETE FROM answers WHERE key IN "
+                        "(SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,)
+                    )
+            except sqlite3.Error as e:
+                print(f"Answer cache store failed: {e}")
+
+    def stats(self):
+        """Hit and miss counts for this process"""
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def create_answer_cache(version):
+    """Create the answer cache configured by environment variables.
+
+    Returns None if it isn't enabled or can't be opened.
+    """
+    if os.getenv("ANSWER_CACHE_ENABLED", "").lower() not in ("1", "true", "yes"):
+        return None
+    path = os.getenv("ANSWER_CACHE_PATH", "answer_cache.sqlite3")
+    try:
+        return AnswerCache(
+            path,
+            version,
+            ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+            max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000"))
+        )
+    except sqlite3.Error as e:
+        print(f"Could not open answer cache at {path}: {e}. Answer caching is disabled.")
+        return None
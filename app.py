@@ -2,15 +2,25 @@ from flask import Flask, render_template, request, jsonify, session
 import os
 from dotenv import load_dotenv
 from datetime import datetime
-import json
 import uuid
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 # Import our custom modules
+# LangChain, geopy and timezonefinder are imported lazily by these modules;
+# call warm_up() to load them before serving traffic
+import astro_utils
+import llm_utils
 from astro_utils import calculate_natal_chart
-from llm_utils import create_cerebras_llm, get_tavily_search
+from llm_utils import (
+    get_tavily_search,
+    format_chart_prompt_block,
+    prefetch_consultation_context,
+    PREFETCH_QUERY,
+    LLM_SETTINGS
+)
+from answer_cache import answer_cache_key, create_answer_cache, key_placements, prompt_version
 
 # Load environment variables
 load_dotenv()
@@ -21,6 +31,215 @@ app.secret_key = os.getenv("SECRET_KEY", "astro-consultation-secret")
 # Initialize session storage for user data
 user_sessions = {}
 
+# Background pool for prefetching consultation context, created on first use
+# so that it is never shared across forked workers
+_prefetch_executor = None
+_prefetch_executor_lock = threading.Lock()
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+# Prefetches queued or running at once; beyond this new charts skip the prefetch
+PREFETCH_MAX_PENDING = int(os.getenv("PREFETCH_MAX_PENDING", str(PREFETCH_WORKERS * 2)))
+_prefetch_slots = threading.BoundedSemaphore(PREFETCH_MAX_PENDING)
+# How long a question waits for a prefetch that is still running
+PREFETCH_WAIT_SECONDS = float(os.getenv("PREFETCH_WAIT_SECONDS", "30"))
+
+CONSULTATION_INSTRUCTIONS = """
+        You are Vidhi ka Vidhan AI, an expert astrologer providing a consultation. 
+        Your tone is encouraging and insightful. 
+        Keep your responses CONCISE, CLEAR, and EASY TO UNDERSTAND. 
+        Use relevant EMOJIS ✨ to make the response engaging. 
+        Use BULLET POINTS for lists or key insights.
+        Focus DIRECTLY on answering the user's specific question based on their chart and the provided context.
+        Acknowledge the chart is generated if needed for context, but don't over-explain.
+"""
+
+CONSULTATION_SYSTEM_PROMPT = CONSULTATION_INSTRUCTIONS + """
+        User Profile:
+        - Name: {name}
+        - Birth Date: {birth_date}
+        - Birth Time: {birth_time}
+        - Birth Location: {birth_location}
+        
+        Natal Chart Information (Generated):
+        {chart_block}
+        
+        Relevant Astrological Information from Research:
+        {search_results}
+        
+        Now, answer the user's question concisely and clearly, using emojis and formatting.
+        """
+
+# Used for first questions when the answer cache is enabled. Cached answers are shared between
+# users, so this prompt has no profile details, only the placements the cache is keyed on
+CACHEABLE_SYSTEM_PROMPT = CONSULTATION_INSTRUCTIONS + """
+        Key Placements (Generated):
+        - Sun: {sun}
+        - Moon: {moon}
+        - Rising: {rising}
+        
+        Relevant Astrological Information from Research:
+        {search_results}
+        
+        Now, answer the user's question concisely and clearly, using emojis and formatting.
+        """
+
+CONSULTATION_HUMAN_TEMPLATE = "{question}"
+
+# Cached answers are only reused while the prompt, the prefetch query and the model settings are unchanged
+PROMPT_VERSION = prompt_version(CACHEABLE_SYSTEM_PROMPT, CONSULTATION_HUMAN_TEMPLATE, PREFETCH_QUERY, LLM_SETTINGS)
+
+# Opt-in answer cache (see answer_cache.py), opened on first use
+_answer_cache = None
+_answer_cache_loaded = False
+_answer_cache_lock = threading.Lock()
+
+def preload():
+    """Import heavy dependencies and load read-only assets, without creating any network clients.
+
+    Call this once in a pre-fork server master (see serve.py); each worker then calls warm_up().
+    """
+    import langchain_core.prompts  # noqa: F401
+    import langchain_core.messages  # noqa: F401
+    llm_utils.import_integrations()
+    astro_utils.preload_assets()
+
+def warm_up():
+    """Load heavy dependencies and shared clients so the first request doesn't pay for them.
+
+    Call this once per process before it starts taking traffic.
+    """
+    import langchain_core.prompts  # noqa: F401
+    import langchain_core.messages  # noqa: F401
+    astro_utils.warm_up()
+    llm_utils.warm_up()
+
+def get_prefetch_executor():
+    """Return the background pool used for prefetching, creating it on first use"""
+    global _prefetch_executor
+    if _prefetch_executor is None:
+        with _prefetch_executor_lock:
+            if _prefetch_executor is None:
+                _prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+    return _prefetch_executor
+
+def get_answer_cache():
+    """Return the answer cache if it is enabled, opening it on first use (after workers fork)"""
+    global _answer_cache, _answer_cache_loaded
+    if not _answer_cache_loaded:
+        with _answer_cache_lock:
+            if not _answer_cache_loaded:
+                try:
+                    _answer_cache = create_answer_cache(PROMPT_VERSION)
+                finally:
+                    # Don't retry a cache that failed to open on every question
+                    _answer_cache_loaded = True
+    return _answer_cache
+
+def start_prefetch(profile, chart_data):
+    """Start prefetching consultation context, or return None if the prefetch queue is full"""
+    if not _prefetch_slots.acquire(blocking=False):
+        print("Prefetch queue is full; skipping prefetch")
+        return None
+    future = get_prefetch_executor().submit(prefetch_consultation_context, profile, chart_data)
+    future.add_done_callback(lambda _: _prefetch_slots.release())
+    return future
+
+def get_prefetched_context(user_data):
+    """Return the prefetched search results for a session, or None if unavailable"""
+    future = user_data.get("prefetch")
+    if future is None:
+        return None
+    # A prefetch still waiting in the queue won't finish sooner than a search started now
+    if future.cancel():
+        user_data.pop("prefetch", None)
+        return None
+    try:
+        return future.result(timeout=PREFETCH_WAIT_SECONDS)
+    except FutureTimeoutError:
+        print("Prefetched consultation context timed out")
+        future.cancel()
+        user_data.pop("prefetch", None)
+        return None
+    except Exception as e:
+        print(f"Prefetched consultation context unavailable: {e}")
+        return None
+
+def generate_consultation_answer(question, user_data, chat_history, cacheable=False):
+    """Answer a consultation question with web search context and the LLM.
+
+    With cacheable=True the answer is built from CACHEABLE_SYSTEM_PROMPT, which leaves
+    out the user's profile so the answer can be served to other users.
+
+    Returns (response_text, search_ok); search_ok is False when the web search failed
+    and the answer was generated without research.
+    """
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain_core.messages import HumanMessage, AIMessage
+
+    profile = user_data["profile"]
+    chart_data = user_data["chart_data"]
+
+    # The first question is answered with the sign-based context prefetched after
+    # the chart was generated; follow-ups search for the specific question
+    search_results = get_prefetched_context(user_data) if not chat_history else None
+    if search_results is None:
+        # Perform web search for relevant astrological information
+        search_results = get_tavily_search(question, profile, chart_data)
+    # get_tavily_search reports failures as text; prefetched results never contain one
+    search_ok = not search_results.startswith("\nError:")
+    
+    # Reuse the shared LLM instance
+    llm = llm_utils.get_llm_instance()
+    if llm is None:
+        raise RuntimeError("LLM not initialized. Check CEREBRAS_API_KEY and the server logs.")
+    
+    # 1. Format the system message string FIRST
+    if cacheable:
+        placements = key_placements(chart_data)
+        system_message_content = CACHEABLE_SYSTEM_PROMPT.format(
+            sun=placements["Sun"],
+            moon=placements["Moon"],
+            rising=placements["Rising"],
+            search_results=search_results
+        )
+    else:
+        system_message_content = CONSULTATION_SYSTEM_PROMPT.format(
+            name=profile.get('name', 'N/A'),
+            birth_date=profile.get('birth_date', 'N/A'),
+            birth_time=profile.get('birth_time', 'N/A'),
+            birth_location=profile.get('birth_location', 'N/A'),
+            chart_block=format_chart_prompt_block(chart_data),
+            search_results=search_results
+        )
+
+    # 2. Format chat history into LangChain message objects
+    formatted_chat_history = []
+    for message in chat_history:
+        if message.get("role") == "user":
+            formatted_chat_history.append(HumanMessage(content=message.get("content", "")))
+        elif message.get("role") == "assistant":
+            formatted_chat_history.append(AIMessage(content=message.get("content", "")))
+
+    # --- Create Template and Chain --- 
+    # 3. Create a ChatPromptTemplate using standard placeholders
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", "{system_message}"), # Placeholder for the formatted system message
+        MessagesPlaceholder(variable_name="chat_history"), # Placeholder for history list
+        ("human", CONSULTATION_HUMAN_TEMPLATE) # Placeholder for the current question
+    ])
+    
+    # 4. Generate the response using the prompt, LLM, and providing ALL input variables
+    chain = prompt | llm
+    # Pass the actual variables to invoke
+    response = chain.invoke({
+        "system_message": system_message_content,
+        "chat_history": formatted_chat_history, # Pass the list of message objects
+        "question": question
+    })
+    
+    # Extract content from AIMessage
+    response_text = response.content if hasattr(response, 'content') else str(response)
+    return response_text, search_ok
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -57,19 +276,27 @@ def generate_chart():
         
         # Store user data and chart info in the session storage
         # Always update the user's entry to handle server restarts during development
+        profile = {
+            "name": name,
+            "birth_date": birth_date,
+            "birth_time": birth_time,
+            "birth_location": birth_location
+        }
         user_sessions[user_id] = {
-            "profile": {
-                "name": name,
-                "birth_date": birth_date,
-                "birth_time": birth_time,
-                "birth_location": birth_location
-            },
+            "profile": profile,
             "chart_data": chart_data,
             # Preserve existing chat history and readings if the user is regenerating
             "chat_history": user_sessions.get(user_id, {}).get("chat_history", []),
             "readings": user_sessions.get(user_id, {}).get("readings", [])
         }
         
+        # Start preparing the consultation context while the user looks at their chart.
+        # It is only used for the first question, so skip it when the kept history isn't empty
+        if 'error' not in chart_data and not user_sessions[user_id]["chat_history"]:
+            prefetch = start_prefetch(profile, chart_data)
+            if prefetch is not None:
+                user_sessions[user_id]["prefetch"] = prefetch
+        
         return jsonify({
             "success": True,
             "chart_data": chart_data
@@ -94,72 +321,30 @@ def ask_question():
                 "error": "User session not found. Please generate your chart first."
             }), 400
         
-        # Get user's profile and chart data
+        # Get user's chart data
         user_data = user_sessions[user_id]
-        profile = user_data["profile"]
         chart_data = user_data["chart_data"]
         
-        # Perform web search for relevant astrological information
-        search_results = get_tavily_search(question, profile, chart_data)
-        
-        # Create LLM instance
-        llm = create_cerebras_llm()
-        
         # Create a chat history from previous interactions
         chat_history = user_data.get("chat_history", [])
         
-        # 1. Format the system message string FIRST
-        system_message_content = f"""
-        You are Vidhi ka Vidhan AI, an expert astrologer providing a consultation. 
-        Your tone is encouraging and insightful. 
-        Keep your responses CONCISE, CLEAR, and EASY TO UNDERSTAND. 
-        Use relevant EMOJIS ✨ to make the response engaging. 
-        Use BULLET POINTS for lists or key insights.
-        Focus DIRECTLY on answering the user's specific question based on their chart and the provided context.
-        Acknowledge the chart is generated if needed for context, but don't over-explain.
-
-        User Profile:
-        - Name: {profile.get('name', 'N/A')}
-        - Birth Date: {profile.get('birth_date', 'N/A')}
-        - Birth Time: {profile.get('birth_time', 'N/A')}
-        - Birth Location: {profile.get('birth_location', 'N/A')}
-        
-        Natal Chart Information (Generated):
-        {json.dumps(chart_data, indent=2)}
-        
-        Relevant Astrological Information from Research:
-        {search_results}
-        
-        Now, answer the user's question concisely and clearly, using emojis and formatting.
-        """
-
-        # 2. Format chat history into LangChain message objects
-        formatted_chat_history = []
-        for message in chat_history:
-            if message.get("role") == "user":
-                formatted_chat_history.append(HumanMessage(content=message.get("content", "")))
-            elif message.get("role") == "assistant":
-                formatted_chat_history.append(AIMessage(content=message.get("content", "")))
-
-        # --- Create Template and Chain --- 
-        # 3. Create a ChatPromptTemplate using standard placeholders
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "{system_message}"), # Placeholder for the formatted system message
-            MessagesPlaceholder(variable_name="chat_history"), # Placeholder for history list
-            ("human", "{question}") # Placeholder for the current question
-        ])
-        
-        # 4. Generate the response using the prompt, LLM, and providing ALL input variables
-        chain = prompt | llm
-        # Pass the actual variables to invoke
-        response = chain.invoke({
-            "system_message": system_message_content,
-            "chat_history": formatted_chat_history, # Pass the list of message objects
-            "question": question
-        })
+        # Serve repeated first questions about the same placements from the answer cache
+        cache = get_answer_cache()
+        cache_key = None
+        cached_answer = None
+        if cache and not chat_history and 'error' not in chart_data:
+            cache_key = answer_cache_key(question, chart_data, PROMPT_VERSION)
+            cached_answer = cache.get(cache_key)
         
-        # Extract content from AIMessage
-        response_text = response.content if hasattr(response, 'content') else str(response)
+        if cached_answer is not None:
+            response_text = cached_answer
+            print(f"Answer cache hit for user {user_id} ({cache.stats()})")
+        else:
+            response_text, search_ok = generate_consultation_answer(question, user_data, chat_history,
+                                                                    cacheable=cache_key is not None)
+            # Don't share an answer that was generated without research
+            if cache_key and search_ok:
+                cache.put(cache_key, response_text)
         
         # Add to chat history
         chat_history.append({"role": "user", "content": question})
@@ -170,13 +355,15 @@ def ask_question():
         reading = {
             "timestamp": datetime.now().isoformat(),
             "question": question,
-            "response": response_text
+            "response": response_text,
+            "cached": cached_answer is not None
         }
         user_data["readings"].append(reading)
         
         return jsonify({
             "success": True,
-            "response": response_text
+            "response": response_text,
+            "cached": cached_answer is not None
         })
     
     except Exception as e:
@@ -1,17 +1,17 @@
 import datetime
 import pytz
-from timezonefinder import TimezoneFinder
-from geopy.geocoders import Nominatim
 import math
 import os
 import random # Added for random generation
+import threading
 
 # Import the Tavily coordinate function and LLM call function
 from llm_utils import get_coordinates_from_tavily, call_llm_api
 
-# Set up geocoding services with proper user agent
-geolocator = Nominatim(user_agent="astrology-ai-consultation")
-tf = TimezoneFinder()
+# Geocoding and timezone services are created on first use (see warm_up)
+_geolocator = None
+_timezone_finder = None
+_clients_lock = threading.Lock()
 
 # Planets and celestial bodies (simplified list for random generation)
 CELESTIAL_BODIES_NAMES = [
@@ -27,12 +27,49 @@ ZODIAC_SIGNS = [
     'Sagittarius', 'Capricorn', 'Aquarius', 'Pisces'
 ]
 
+def get_geolocator():
+    """Return the shared Nominatim geocoder, creating it on first use"""
+    global _geolocator
+    if _geolocator is None:
+        with _clients_lock:
+            if _geolocator is None:
+                from geopy.geocoders import Nominatim
+                # Set up geocoding service with proper user agent
+                _geolocator = Nominatim(user_agent="astrology-ai-consultation")
+    return _geolocator
+
+def get_timezone_finder(in_memory=False):
+    """Return the shared TimezoneFinder, loading its timezone index on first use.
+
+    With in_memory=True the whole index is read into memory instead of being read
+    from disk on each lookup.
+    """
+    global _timezone_finder
+    if _timezone_finder is None:
+        with _clients_lock:
+            if _timezone_finder is None:
+                from timezonefinder import TimezoneFinder
+                _timezone_finder = TimezoneFinder(in_memory=in_memory)
+    return _timezone_finder
+
+def preload_assets():
+    """Load read-only data (the timezone index) fully into memory.
+
+    Call this in a pre-fork server master so the workers share it copy-on-write.
+    """
+    get_timezone_finder(in_memory=True)
+
+def warm_up():
+    """Create the geocoding and timezone clients ahead of the first request"""
+    get_geolocator()
+    get_timezone_finder()
+
 def get_location_coordinates(location_name):
     """Get latitude and longitude for a location name (Kept for context)"""
     try:
         # First try with Nominatim
         print(f"Attempting to geocode '{location_name}' with Nominatim...")
-        location = geolocator.geocode(location_name)
+        location = get_geolocator().geocode(location_name)
         if location:
             # Debug info
             print(f"Nominatim found: {location.address}")
@@ -96,7 +133,7 @@ def get_timezone_for_location(lat, lng):
             print(f"Warning: Invalid coordinates for timezone lookup: lat={lat}, lng={lng}. Defaulting to UTC.")
             return 'UTC'
             
-        tz_name = tf.timezone_at(lat=lat, lng=lng)
+        tz_name = get_timezone_finder().timezone_at(lat=lat, lng=lng)
         if not tz_name:
             print(f"No timezone found for coordinates: lat={lat}, lng={lng}. Defaulting to UTC.")
              # Simple fallback based on longitude (very rough)
@@ -178,6 +215,26 @@ def generate_random_chart_structure():
         }
     }
 
+def compile_chart_data(birth_date, birth_time, formatted_address, lat, lng, timezone_str):
+    """Generates the placements for a resolved birth place and compiles the chart data dictionary (without interpretation)."""
+    # Generate Random Astrological Data
+    random_chart = generate_random_chart_structure()
+
+    return {
+        'date': birth_date,
+        'time': birth_time if birth_time else '12:00 (Assumed)',
+        'location': formatted_address,
+        'latitude': lat,
+        'longitude': lng,
+        'timezone': timezone_str,
+        'julian_day': None, # Not calculated
+        'houses': random_chart['houses'], # Use random houses
+        'planets': random_chart['planets'], # Use random planets
+        'aspects': random_chart['aspects'], # Use empty aspects
+        'ascendant': random_chart['ascendant'], # Use random ascendant
+        'midheaven': random_chart['midheaven'] # Use random midheaven
+    }
+
 def calculate_natal_chart(birth_date, birth_time, birth_location):
     """Generates a natal chart using random data and LLM interpretation."""
     try:
@@ -194,24 +251,8 @@ def calculate_natal_chart(birth_date, birth_time, birth_location):
         # 2. Get timezone (still useful for context)
         timezone_str = get_timezone_for_location(lat, lng)
 
-        # 3. Generate Random Astrological Data
-        random_chart = generate_random_chart_structure()
-
-        # 4. Compile the chart data dictionary
-        chart_data = {
-            'date': birth_date,
-            'time': birth_time if birth_time else '12:00 (Assumed)',
-            'location': formatted_address,
-            'latitude': lat,
-            'longitude': lng,
-            'timezone': timezone_str,
-            'julian_day': None, # Not calculated
-            'houses': random_chart['houses'], # Use random houses
-            'planets': random_chart['planets'], # Use random planets
-            'aspects': random_chart['aspects'], # Use empty aspects
-            'ascendant': random_chart['ascendant'], # Use random ascendant
-            'midheaven': random_chart['midheaven'] # Use random midheaven
-        }
+        # 3-4. Generate the placements and compile the chart data dictionary
+        chart_data = compile_chart_data(birth_date, birth_time, formatted_address, lat, lng, timezone_str)
 
         # 5. Generate LLM Interpretation based on the random data
         # Ensure the interpretation function is robust to the new structure
@@ -230,45 +271,60 @@ def calculate_natal_chart(birth_date, birth_time, birth_location):
              'interpretation': "Could not generate interpretation due to an error."
         }
 
+def build_interpretation_prompt(chart_data):
+    """Builds the LLM prompt used to interpret a generated chart."""
+    # Prepare a summary of the chart for the LLM prompt
+    prompt = f"Provide a plausible-sounding astrological interpretation for a generated natal chart with the following details (Note: Placements are randomly generated, not calculated astronomically):\n\n"
+    prompt += f"Birth Date: {chart_data.get('date', 'Unknown')}\n"
+    prompt += f"Birth Time: {chart_data.get('time', 'Unknown')}\n"
+    prompt += f"Birth Location: {chart_data.get('location', 'Unknown')}\n\n"
+
+    # Key placements (handle potential None values)
+    planets = chart_data.get('planets', {})
+    sun_info = planets.get('Sun', {})
+    moon_info = planets.get('Moon', {})
+    asc_info = chart_data.get('ascendant', {})
+
+    if sun_info and 'sign' in sun_info:
+        prompt += f"Sun: {sun_info['sign']}\n"
+    if moon_info and 'sign' in moon_info:
+        prompt += f"Moon: {moon_info['sign']}\n"
+    if asc_info and 'sign' in asc_info:
+        prompt += f"Ascendant (Rising Sign): {asc_info['sign']}\n\n"
+
+    # Add planet positions (simplified)
+    prompt += "Planetary Positions (Generated Signs):\n"
+    for planet, data in planets.items():
+         # Check if data is a dictionary and has the 'sign' key
+        if isinstance(data, dict) and 'sign' in data:
+            retro = " (Retrograde)" if data.get('is_retrograde') else ""
+            prompt += f"- {planet}: {data['sign']}{retro}\n"
+        else:
+             prompt += f"- {planet}: Sign Unavailable\n"
+    prompt += "\n"
+
+    # Aspects are no longer generated, so remove this section from the prompt
+    # if chart_data.get('aspects'):
+    #    prompt += "Major Aspects (Generated):\n"
+    #    ...
+
+    prompt += "Based *only* on these generated sign placements (ignore degrees and houses), offer a brief, general, and positive-toned personality sketch focusing on potential strengths and tendencies. Acknowledge that this is based on random data, not a real calculation."
+    return prompt
+
+def build_sign_interpretation_prompt(sun_sign, moon_sign, rising_sign):
+    """Builds an interpretation prompt from the Sun, Moon and Rising signs only, so the
+    interpretation can be reused for every chart with the same three signs."""
+    prompt = "Provide a plausible-sounding astrological interpretation for a generated natal chart with the following key placements (Note: Placements are randomly generated, not calculated astronomically):\n\n"
+    prompt += f"Sun: {sun_sign}\n"
+    prompt += f"Moon: {moon_sign}\n"
+    prompt += f"Ascendant (Rising Sign): {rising_sign}\n\n"
+    prompt += "Based *only* on these generated sign placements, offer a brief, general, and positive-toned personality sketch focusing on potential strengths and tendencies. Acknowledge that this is based on random data, not a real calculation."
+    return prompt
+
 def generate_llm_interpretation(chart_data):
     """Generates an astrological interpretation using an LLM based on provided chart data."""
     try:
-        # Prepare a summary of the chart for the LLM prompt
-        prompt = f"Provide a plausible-sounding astrological interpretation for a generated natal chart with the following details (Note: Placements are randomly generated, not calculated astronomically):\n\n"
-        prompt += f"Birth Date: {chart_data.get('date', 'Unknown')}\n"
-        prompt += f"Birth Time: {chart_data.get('time', 'Unknown')}\n"
-        prompt += f"Birth Location: {chart_data.get('location', 'Unknown')}\n\n"
-
-        # Key placements (handle potential None values)
-        planets = chart_data.get('planets', {})
-        sun_info = planets.get('Sun', {})
-        moon_info = planets.get('Moon', {})
-        asc_info = chart_data.get('ascendant', {})
-
-        if sun_info and 'sign' in sun_info:
-            prompt += f"Sun: {sun_info['sign']}\n"
-        if moon_info and 'sign' in moon_info:
-            prompt += f"Moon: {moon_info['sign']}\n"
-        if asc_info and 'sign' in asc_info:
-            prompt += f"Ascendant (Rising Sign): {asc_info['sign']}\n\n"
-
-        # Add planet positions (simplified)
-        prompt += "Planetary Positions (Generated Signs):\n"
-        for planet, data in planets.items():
-             # Check if data is a dictionary and has the 'sign' key
-            if isinstance(data, dict) and 'sign' in data:
-                retro = " (Retrograde)" if data.get('is_retrograde') else ""
-                prompt += f"- {planet}: {data['sign']}{retro}\n"
-            else:
-                 prompt += f"- {planet}: Sign Unavailable\n"
-        prompt += "\n"
-
-        # Aspects are no longer generated, so remove this section from the prompt
-        # if chart_data.get('aspects'):
-        #    prompt += "Major Aspects (Generated):\n"
-        #    ...
-
-        prompt += "Based *only* on these generated sign placements (ignore degrees and houses), offer a brief, general, and positive-toned personality sketch focusing on potential strengths and tendencies. Acknowledge that this is based on random data, not a real calculation."
+        prompt = build_interpretation_prompt(chart_data)
 
         # Call the LLM API
         interpretation = call_llm_api(prompt)
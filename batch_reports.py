@@ -0,0 +1,400 @@
+"""Offline bulk chart report generation.
+
+Streams birth records from a CSV or JSONL file through geocoding, timezone
+resolution, chart computation and (optionally) LLM interpretation, and writes one
+JSON chart report per line. Each stage keeps a bounded number of rows in flight,
+so memory use doesn't grow with the size of the input. Geocoding and
+interpretation run in thread pools (they wait on network APIs); timezone
+resolution and chart computation run in a process pool.
+
+Progress is checkpointed next to the output file; re-running the same command
+resumes after the last checkpointed row.
+
+Input rows need a birth date and location, and may have a name and birth time,
+using either the API field names (name, birthDate, birthTime, birthLocation) or
+snake_case ones (name, birth_date, birth_time, birth_location).
+
+Usage:
+    python batch_reports.py customers.csv reports.jsonl --interpret
+"""
+import argparse
+import contextlib
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+import astro_utils
+from answer_cache import key_placements
+from astro_utils import (
+    build_sign_interpretation_prompt,
+    compile_chart_data,
+    get_location_coordinates,
+    get_timezone_for_location
+)
+from llm_utils import call_llm_api
+
+# Accepted input column names for each birth detail
+FIELD_ALIASES = {
+    "name": ("name",),
+    "birth_date": ("birth_date", "birthDate"),
+    "birth_time": ("birth_time", "birthTime"),
+    "birth_location": ("birth_location", "birthLocation")
+}
+
+# Customer lists repeat the same cities, so lookups are cached (per run). Failed lookups
+# are remembered for a while so an unresolvable location doesn't cost a request per row
+GEOCODE_CACHE_SIZE = 10000
+GEOCODE_FAILURE_TTL_SECONDS = 300
+# Interpretations depend only on the Sun, Moon and Rising signs, so there are at most 12 ** 3
+INTERPRETATION_CACHE_SIZE = 12 ** 3
+INTERPRETATION_FAILURE_TTL_SECONDS = 60
+
+# Nominatim's usage policy allows at most one request per second
+GEOCODE_MIN_DELAY_SECONDS = 1.0
+_rate_limited_coordinates = None
+
+# Seconds between progress reports
+PROGRESS_INTERVAL = 5.0
+
+
+def _read_jsonl_rows(f):
+    """Yield (row, error) for each non-blank line; error is set when the line isn't a JSON object"""
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield None, f"Invalid JSON on line {line_number}: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield None, f"Line {line_number} is not a JSON object"
+            continue
+        yield row, None
+
+
+def read_records(input_path, input_format, skip=0):
+    """Yield birth records from a CSV or JSONL file, skipping the first `skip` records.
+
+    Rows that can't be parsed are yielded as records with an `error` field.
+    """
+    with open(input_path, newline='', encoding='utf-8') as f:
+        if input_format == "csv":
+            rows = ((row, None) for row in csv.DictReader(f))
+        else:
+            rows = _read_jsonl_rows(f)
+
+        for row, error in itertools.islice(rows, skip, None):
+            if error:
+                yield {"error": error}
+                continue
+            record = {}
+            for field, aliases in FIELD_ALIASES.items():
+                record[field] = next((row[alias] for alias in aliases if row.get(alias)), None)
+            yield record
+
+
+def bounded_map(executor, fn, items, window):
+    """Like executor.map(fn, items), but with at most `window` items in flight.
+
+    Results are yielded in input order and `items` is consumed lazily, unlike
+    Executor.map which submits the whole iterable up front.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class SingleFlightCache:
+    """Memoizes fn(*args) for use from many threads.
+
+    Concurrent calls with the same arguments share one call to fn. Results are kept
+    up to maxsize (least recently used evicted first), and failures are re-raised
+    without calling fn again for failure_ttl seconds.
+    """
+
+    def __init__(self, fn, maxsize, failure_ttl):
+        self._fn = fn
+        self._maxsize = maxsize
+        self._failure_ttl = failure_ttl
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+        self._failures = OrderedDict()
+        self._in_flight = {}
+
+    def __call__(self, *args):
+        with self._lock:
+            if args in self._results:
+                self._results.move_to_end(args)
+                return self._results[args]
+            failure = self._failures.get(args)
+            if failure is not None and time.monotonic() - failure[1] < self._failure_ttl:
+                raise failure[0]
+            future = self._in_flight.get(args)
+            owner = future is None
+            if owner:
+                future = self._in_flight[args] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = self._fn(*args)
+        except Exception as e:
+            with self._lock:
+                self._failures[args] = (e, time.monotonic())
+                self._failures.move_to_end(args)
+                if len(self._failures) > self._maxsize:
+                    self._failures.popitem(last=False)
+                del self._in_flight[args]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._results[args] = value
+            if len(self._results) > self._maxsize:
+                self._results.popitem(last=False)
+            self._failures.pop(args, None)
+            del self._in_flight[args]
+        future.set_result(value)
+        return value
+
+
+def _get_rate_limited_coordinates():
+    global _rate_limited_coordinates
+    if _rate_limited_coordinates is None:
+        from geopy.extra.rate_limiter import RateLimiter
+        # RateLimiter is thread-safe, so the geocoding threads share one request budget
+        _rate_limited_coordinates = RateLimiter(get_location_coordinates, min_delay_seconds=GEOCODE_MIN_DELAY_SECONDS)
+    return _rate_limited_coordinates
+
+
+def _resolve_coordinates(location_name):
+    location_data = _get_rate_limited_coordinates()(location_name)
+    # get_location_coordinates reports failures (including throttling) as None;
+    # raise instead so they are only remembered for GEOCODE_FAILURE_TTL_SECONDS
+    if location_data is None:
+        raise LookupError(f"Could not resolve location '{location_name}'")
+    return location_data
+
+
+def _interpret_signs(sun_sign, moon_sign, rising_sign):
+    interpretation = call_llm_api(build_sign_interpretation_prompt(sun_sign, moon_sign, rising_sign))
+    # call_llm_api reports failures as text; raise instead so they aren't cached
+    if interpretation.startswith("Error"):
+        raise RuntimeError(interpretation)
+    return interpretation
+
+
+_cached_coordinates = SingleFlightCache(_resolve_coordinates, GEOCODE_CACHE_SIZE, GEOCODE_FAILURE_TTL_SECONDS)
+_cached_interpretation = SingleFlightCache(_interpret_signs, INTERPRETATION_CACHE_SIZE,
+                                           INTERPRETATION_FAILURE_TTL_SECONDS)
+
+
+def geocode_record(record):
+    """I/O stage: resolve the birth location to coordinates"""
+    if "error" in record:
+        return record
+    if not record.get("birth_date") or not record.get("birth_location"):
+        record["error"] = "Missing birth date or birth location"
+        return record
+    try:
+        record["location_data"] = _cached_coordinates(record["birth_location"])
+    except Exception as e:
+        record["error"] = f"Failed to geocode location: {e}"
+    return record
+
+
+def chart_record(record):
+    """CPU stage: resolve the timezone and compute the chart"""
+    if "error" in record:
+        return record
+    try:
+        location_data = record.pop("location_data", None) or {}
+        lat = location_data.get('lat')
+        lng = location_data.get('lng')
+        formatted_address = location_data.get('formatted_address', record["birth_location"])
+        timezone_str = get_timezone_for_location(lat, lng)
+        record["chart_data"] = compile_chart_data(
+            record["birth_date"], record["birth_time"], formatted_address, lat, lng, timezone_str
+        )
+    except Exception as e:
+        record["error"] = f"Failed to generate chart: {e}"
+    return record
+
+
+def interpret_record(record):
+    """I/O stage: add the LLM interpretation of the chart's Sun, Moon and Rising signs"""
+    if "error" in record:
+        return record
+    try:
+        placements = key_placements(record["chart_data"])
+        record["chart_data"]["interpretation"] = _cached_interpretation(
+            placements["Sun"], placements["Moon"], placements["Rising"]
+        )
+    except Exception as e:
+        print(f"Error generating LLM interpretation: {e}")
+        record["chart_data"]["interpretation"] = "Error: Could not generate interpretation."
+    return record
+
+
+def _init_chart_worker(verbose):
+    if not verbose:
+        # Chart computation logs every row; keep it out of the terminal
+        sys.stdout = open(os.devnull, 'w')
+    # Load the timezone index once per worker process rather than on its first row
+    astro_utils.get_timezone_finder()
+
+
+def load_checkpoint(checkpoint_path, input_path):
+    """Return the saved progress for input_path, or a fresh state if there is none"""
+    state = {"input": os.path.abspath(input_path), "rows_done": 0, "output_offset": 0}
+    if not os.path.exists(checkpoint_path):
+        return state
+    with open(checkpoint_path, encoding='utf-8') as f:
+        saved = json.load(f)
+    if saved.get("input") != state["input"]:
+        raise ValueError(f"Checkpoint {checkpoint_path} belongs to {saved.get('input')}, not {state['input']}. "
+                         "Use --restart to start over.")
+    return saved
+
+
+def save_checkpoint(checkpoint_path, state):
+    """Atomically write the progress state"""
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def run_pipeline(input_path, output_path, input_format="csv", interpret=False, checkpoint_path=None,
+                 restart=False, cpu_workers=None, io_workers=8, window=256, checkpoint_every=1000, verbose=False):
+    """Generate chart reports for every record in input_path and write them to output_path as JSONL.
+
+    Progress goes to stderr; per-row logging from the geocoding and chart code is
+    discarded unless verbose is set.
+    """
+    checkpoint_path = checkpoint_path or output_path + ".checkpoint"
+    if restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    state = load_checkpoint(checkpoint_path, input_path)
+
+    if state["rows_done"] and os.path.exists(output_path):
+        print(f"Resuming after row {state['rows_done']}", file=sys.stderr)
+        out = open(output_path, 'r+b')
+        # Drop anything written after the last checkpoint; those rows are redone
+        out.truncate(state["output_offset"])
+        out.seek(state["output_offset"])
+    else:
+        state.update(rows_done=0, output_offset=0)
+        out = open(output_path, 'wb')
+
+    with contextlib.ExitStack() as stack:
+        if not verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+
+        geocode_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="geocode")
+        chart_pool = ProcessPoolExecutor(
+            max_workers=cpu_workers,
+            # Spawn rather than fork: forking while the geocoding threads run can
+            # leave a worker holding a copy of a lock that is never released
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_chart_worker,
+            initargs=(verbose,)
+        )
+        interpret_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="interpret")
+
+        start_time = time.monotonic()
+        last_report = start_time
+        rows_this_run = 0
+        try:
+            records = read_records(input_path, input_format, skip=state["rows_done"])
+            records = bounded_map(geocode_pool, geocode_record, records, window)
+            records = bounded_map(chart_pool, chart_record, records, window)
+            if interpret:
+                records = bounded_map(interpret_pool, interpret_record, records, window)
+
+            for record in records:
+                record.pop("location_data", None)
+                out.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b"\n")
+                state["rows_done"] += 1
+                rows_this_run += 1
+
+                if rows_this_run % checkpoint_every == 0:
+                    out.flush()
+                    os.fsync(out.fileno())
+                    state["output_offset"] = out.tell()
+                    save_checkpoint(checkpoint_path, state)
+
+                now = time.monotonic()
+                if now - last_report >= PROGRESS_INTERVAL:
+                    rate = rows_this_run / (now - start_time)
+                    print(f"{state['rows_done']} rows done ({rate:.1f} rows/sec)", file=sys.stderr)
+                    last_report = now
+        finally:
+            # Record everything written so far, including when interrupted
+            out.flush()
+            state["output_offset"] = out.tell()
+            out.close()
+            save_checkpoint(checkpoint_path, state)
+            for pool in (geocode_pool, chart_pool, interpret_pool):
+                pool.shutdown(cancel_futures=True)
+
+    elapsed = time.monotonic() - start_time
+    rate = rows_this_run / elapsed if elapsed else 0.0
+    print(f"Finished: {state['rows_done']} rows ({rows_this_run} this run, {rate:.1f} rows/sec)", file=sys.stderr)
+    return state["rows_done"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate natal chart reports for a list of birth records")
+    parser.add_argument("input", help="CSV or JSONL file of birth records")
+    parser.add_argument("output", help="JSONL file to write chart reports to")
+    parser.add_argument("--format", choices=["csv", "jsonl"],
+                        help="Input format (default: from the input file extension)")
+    parser.add_argument("--interpret", action="store_true", help="Add an LLM interpretation to each chart")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint and start over")
+    parser.add_argument("--cpu-workers", type=int, help="Chart computation processes (default: number of CPUs)")
+    parser.add_argument("--io-workers", type=int, default=8, help="Threads for geocoding and interpretation")
+    parser.add_argument("--window", type=int, default=256, help="Maximum rows in flight per stage")
+    parser.add_argument("--checkpoint-every", type=int, default=1000, help="Rows between checkpoints")
+    parser.add_argument("--verbose", action="store_true", help="Show per-row geocoding and chart logging")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    input_format = args.format or ("jsonl" if args.input.endswith((".jsonl", ".ndjson")) else "csv")
+    try:
+        run_pipeline(
+            args.input,
+            args.output,
+            input_format=input_format,
+            interpret=args.interpret,
+            checkpoint_path=args.checkpoint,
+            restart=args.restart,
+            cpu_workers=args.cpu_workers,
+            io_workers=args.io_workers,
+            window=args.window,
+            checkpoint_every=args.checkpoint_every,
+            verbose=args.verbose
+        )
+    except KeyboardInterrupt:
+        print("Interrupted; progress saved. Run the same command again to resume.", file=sys.stderr)
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,20 @@
 import os
 from dotenv import load_dotenv
-from langchain_cerebras import ChatCerebras
-from langchain_tavily import TavilySearch
 import json
 import re
+import threading
+import time
 
 # Load environment variables
 load_dotenv()
 
+# Model and generation settings for ChatCerebras
+LLM_SETTINGS = {
+    "model": "llama-4-scout-17b-16e-instruct",  # Use an appropriate Cerebras model
+    "temperature": 0.7,
+    "max_tokens": 8000
+}
+
 def create_cerebras_llm():
     """Create and configure ChatCerebras LLM instance"""
     try:
@@ -17,14 +24,12 @@ def create_cerebras_llm():
         if not api_key:
             raise ValueError("CEREBRAS_API_KEY not found in environment variables")
         
+        # Imported here so that importing this module stays cheap
+        from langchain_cerebras import ChatCerebras
+        
         # Initialize the ChatCerebras model as shown in documentation
         # https://python.langchain.com/docs/integrations/chat/cerebras/
-        llm = ChatCerebras(
-            cerebras_api_key=api_key,
-            temperature=0.7,
-            max_tokens=8000,
-            model="llama-4-scout-17b-16e-instruct"  # Use an appropriate Cerebras model
-        )
+        llm = ChatCerebras(cerebras_api_key=api_key, **LLM_SETTINGS)
         
         return llm
     
@@ -32,13 +37,43 @@ def create_cerebras_llm():
         print(f"Error creating Cerebras LLM: {e}")
         raise
 
-# Create the LLM instance globally or pass it around
-# Creating it once might be more efficient if called frequently
-try:
-    llm_instance = create_cerebras_llm()
-except Exception as e:
-    llm_instance = None
-    print(f"Failed to initialize Cerebras LLM: {e}. Interpretation will fail.")
+# Shared LLM instance, created on first use by get_llm_instance()
+llm_instance = None
+_llm_lock = threading.Lock()
+# When creating the LLM last failed; creation isn't retried more often than LLM_RETRY_SECONDS
+_llm_failed_at = None
+LLM_RETRY_SECONDS = 60
+
+def get_llm_instance():
+    """Return the shared Cerebras LLM instance, creating it on first use.
+
+    Returns None if creation failed less than LLM_RETRY_SECONDS ago.
+    """
+    global llm_instance, _llm_failed_at
+    if llm_instance is not None:
+        return llm_instance
+    with _llm_lock:
+        if llm_instance is None:
+            if _llm_failed_at is not None and time.monotonic() - _llm_failed_at < LLM_RETRY_SECONDS:
+                return None
+            try:
+                llm_instance = create_cerebras_llm()
+                _llm_failed_at = None
+            except Exception as e:
+                _llm_failed_at = time.monotonic()
+                print(f"Failed to initialize Cerebras LLM: {e}. Interpretation will fail "
+                      f"(retrying in {LLM_RETRY_SECONDS}s).")
+    return llm_instance
+
+def import_integrations():
+    """Import the LangChain integrations without creating any clients"""
+    import langchain_cerebras  # noqa: F401
+    import langchain_tavily  # noqa: F401
+
+def warm_up():
+    """Import the LangChain integrations and create the shared LLM ahead of the first request"""
+    import_integrations()
+    get_llm_instance()
 
 def get_tavily_search(query, profile, chart_data):
     """Perform web search for astrological information related to the query using Tavily"""
@@ -49,6 +84,8 @@ def get_tavily_search(query, profile, chart_data):
         if not api_key:
             raise ValueError("TAVILY_API_KEY not found in environment variables")
         
+        from langchain_tavily import TavilySearch
+        
         # Extract relevant information from the chart data for search context
         # Handle potential missing keys gracefully
         sun_sign = chart_data.get('planets', {}).get('Sun', {}).get('sign', 'Unknown')
@@ -112,6 +149,26 @@ def get_tavily_search(query, profile, chart_data):
         print(f"Error performing Tavily search: {e}")
         return f"\nError: Could not perform web search - {str(e)}"
 
+# Generic question searched as soon as a chart exists, before the user asks anything
+PREFETCH_QUERY = "personality, strengths, career, relationships and life themes"
+
+def format_chart_prompt_block(chart_data):
+    """Serialize chart data compactly for inclusion in the consultation prompt"""
+    return json.dumps(chart_data, separators=(',', ':'), ensure_ascii=False)
+
+def prefetch_consultation_context(profile, chart_data):
+    """Run a generic Sun/Moon/Rising search for a freshly generated chart.
+
+    The results answer the user's first question so it doesn't wait for a search.
+    Raises if the search fails, so callers fall back to searching for the question.
+    """
+    print("Prefetching consultation context...")
+    search_results = get_tavily_search(PREFETCH_QUERY, profile, chart_data)
+    # get_tavily_search reports failures as text
+    if search_results.startswith("\nError:"):
+        raise RuntimeError(search_results.strip())
+    return search_results
+
 def format_astrological_analysis(chart_data):
     """Format natal chart data into a human-readable astrological analysis"""
     try:
@@ -179,8 +236,8 @@ def call_llm_api(prompt: str) -> str:
     """
     Sends a prompt to the configured Cerebras LLM API and returns the response.
     """
-    global llm_instance
-    if llm_instance is None:
+    llm = get_llm_instance()
+    if llm is None:
         print("Error: Cerebras LLM instance is not available.")
         return "Error: LLM not initialized. Cannot generate interpretation."
         
@@ -191,7 +248,7 @@ def call_llm_api(prompt: str) -> str:
     
     try:
         # Use the invoke method for LangChain components
-        response = llm_instance.invoke(prompt)
+        response = llm.invoke(prompt)
         
         # The response object might be complex, extract the content
         # Adjust based on the actual structure of ChatCerebras response
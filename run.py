@@ -1,4 +1,10 @@
-from app import app
+import os
+
+from app import app, warm_up
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
+    # With debug=True the reloader re-runs this script in a child process that serves
+    # requests; only warm up there, not in the parent that just watches files
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        warm_up()
+    app.run(debug=True, host='0.0.0.0', port=5000) 
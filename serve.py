@@ -0,0 +1,106 @@
+"""Production entry point: serves the app with a pre-fork gunicorn server.
+
+The app's modules and read-only assets are loaded once in the master process before
+the workers are forked, so the workers share them copy-on-write. Network clients
+are created in each worker after the fork. On SIGTERM the master stops accepting
+connections and gives in-flight consultations up to --graceful-timeout seconds to
+finish before the workers are stopped.
+
+Consultation sessions live in worker memory, so the server runs a single worker
+with several threads; more workers are only allowed with --allow-unshared-sessions.
+
+Usage:
+    python serve.py --threads 8 --bind 0.0.0.0:8000
+"""
+import argparse
+import gc
+import os
+
+from gunicorn.app.base import BaseApplication
+
+
+class AstrologyApplication(BaseApplication):
+    """Gunicorn application that preloads the Flask app before forking workers"""
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app import app, preload
+
+        # Load dependencies and the timezone index in the master; network clients
+        # are created per worker in post_fork so no connection state is shared
+        print("Preloading application assets before forking workers...")
+        preload()
+
+        # Move everything loaded so far out of the garbage collector's reach so that
+        # collections in the workers don't touch (and copy) the shared pages
+        gc.collect()
+        gc.freeze()
+        return app
+
+
+def post_fork(server, worker):
+    """Runs in each worker right after it is forked"""
+    from app import warm_up
+
+    # Create the network clients (LLM, geocoder) in the worker
+    warm_up()
+    server.log.info(f"Worker {worker.pid} ready")
+
+
+def worker_int(worker):
+    """Runs when a worker is interrupted"""
+    worker.log.info(f"Worker {worker.pid} interrupted")
+
+
+def worker_exit(server, worker):
+    """Runs in the worker once it has drained its in-flight requests"""
+    server.log.info(f"Worker {worker.pid} finished in-flight requests and exited")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve Vidhi ka Vidhan AI with gunicorn")
+    parser.add_argument("--bind", default=os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}"),
+                        help="Address to listen on (default: 0.0.0.0:$PORT or 0.0.0.0:8000)")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")),
+                        help="Number of worker processes (default: $WEB_CONCURRENCY or 1)")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("WEB_THREADS", "8")),
+                        help="Threads per worker; more than 1 uses gunicorn's threaded worker (default: 8)")
+    parser.add_argument("--allow-unshared-sessions", action="store_true",
+                        help="Allow more than one worker even though each worker keeps its own consultation "
+                             "sessions, so a question can fail with 'User session not found'")
+    parser.add_argument("--timeout", type=int, default=int(os.getenv("WEB_TIMEOUT", "120")),
+                        help="Seconds a request may run before its worker is restarted")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("WEB_GRACEFUL_TIMEOUT", "60")),
+                        help="Seconds workers get to finish in-flight requests on shutdown")
+    args = parser.parse_args()
+    if args.workers > 1 and not args.allow_unshared_sessions:
+        parser.error("consultation sessions are kept in worker memory, so more than one worker breaks "
+                     "consultations; use --threads to scale, or pass --allow-unshared-sessions")
+    return args
+
+
+def main():
+    args = parse_args()
+    options = {
+        "bind": args.bind,
+        "workers": args.workers,
+        "threads": args.threads,
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "preload_app": True,
+        "post_fork": post_fork,
+        "worker_int": worker_int,
+        "worker_exit": worker_exit,
+    }
+    AstrologyApplication(options).run()
+
+
+if __name__ == "__main__":
+    main()